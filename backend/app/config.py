@@ -2,13 +2,23 @@
 Application configuration settings.
 """
 
-from pydantic_settings import BaseSettings
-from functools import lru_cache
+import pydantic
+import pydantic_core  # noqa: F401 - fail fast if the compiled core is missing
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import cache
+
+
+# Every model in the app relies on the compiled pydantic-core validators;
+# refuse to start on a v1 install rather than silently running the slow path.
+if not pydantic.VERSION.startswith("2."):
+    raise RuntimeError(f"Pydantic v2 is required, found {pydantic.VERSION}")
 
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
 
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", frozen=True)
+
     # Application
     app_name: str = "AI Log Analyzer API"
     app_version: str = "1.0.0-POC"
@@ -18,16 +28,44 @@ class Settings(BaseSettings):
     ollama_host: str = "http://ollama:11434"
     ollama_model: str = "gpt-oss:20b"
     ollama_timeout: int = 120
+    ollama_connect_timeout: float = 2.0
+    ollama_keep_alive: str = "30m"
+    ollama_num_ctx: int = 4096
+    ollama_num_predict: int = 2000
+    ollama_max_parallel: int = 8
 
-    # CORS
-    cors_origins: list[str] = ["http://localhost:3000", "http://localhost:5173", "http://frontend:80"]
+    # Analysis result cache
+    analysis_cache_ttl: float = 30.0
+    analysis_cache_size: int = 256
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+    # Health
+    health_cache_ttl: float = 3.0
 
+    # Actions
+    simulate_execute_delay: float = 0.0
 
-@lru_cache
+    # CORS
+    cors_origins: list[str] = ["http://localhost:3000", "http://localhost:3001", "http://localhost:5173", "http://frontend:80"]
+
+
+@cache
 def get_settings() -> Settings:
     """Get cached settings instance."""
     return Settings()
+
+
+# Settings are frozen, so hot paths read these module-level values instead of
+# going through get_settings() and the model's attribute access on every request.
+_settings = get_settings()
+OLLAMA_HOST = _settings.ollama_host
+OLLAMA_MODEL = _settings.ollama_model
+OLLAMA_TIMEOUT = _settings.ollama_timeout
+OLLAMA_CONNECT_TIMEOUT = _settings.ollama_connect_timeout
+OLLAMA_KEEP_ALIVE = _settings.ollama_keep_alive
+OLLAMA_NUM_CTX = _settings.ollama_num_ctx
+OLLAMA_NUM_PREDICT = _settings.ollama_num_predict
+OLLAMA_MAX_PARALLEL = _settings.ollama_max_parallel
+ANALYSIS_CACHE_TTL = _settings.analysis_cache_ttl
+ANALYSIS_CACHE_SIZE = _settings.analysis_cache_size
+HEALTH_CACHE_TTL = _settings.health_cache_ttl
+SIMULATE_EXECUTE_DELAY = _settings.simulate_execute_delay
@@ -4,29 +4,70 @@ KubeSentinel Backend API
 FastAPI application providing Ollama LLM integration for Kubernetes log analysis.
 """
 
+import logging
+import queue
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+import pydantic
+import pydantic_core
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
 from app.routes import analysis
+from app.services.ollama_service import close_client, get_client
+
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging(debug: bool) -> QueueListener:
+    """Route the app's loggers through a queue drained by a listener thread."""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [QueueHandler(log_queue)]
+    app_logger.setLevel(logging.DEBUG if debug else logging.INFO)
+    app_logger.propagate = False
+
+    return QueueListener(log_queue, handler)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared resources on startup and release them on shutdown."""
+    app.state.log_listener.start()
+    await get_client()
+    yield
+    await close_client()
+    app.state.log_listener.stop()
 
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
     settings = get_settings()
+    log_listener = configure_logging(settings.debug)
+    logger.info("Using pydantic %s (pydantic-core %s)", pydantic.VERSION, pydantic_core.__version__)
 
     app = FastAPI(
         title=settings.app_name,
         version=settings.app_version,
         description="AI-Powered Kubernetes Incident Manager Backend API",
         docs_url="/docs",
-        redoc_url="/redoc"
+        redoc_url="/redoc",
+        lifespan=lifespan
     )
 
-    # Configure CORS
+    app.state.log_listener = log_listener
+
+    # Configure CORS - allow any origin in debug, only the configured ones otherwise
+    allow_origins = ("*",) if settings.debug else tuple(settings.cors_origins)
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=settings.cors_origins + ["*"],  # Allow all for development
+        allow_origins=allow_origins,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
@@ -2,17 +2,16 @@
 Pydantic schemas for API request/response models.
 """
 
+import msgspec
+from dataclasses import dataclass
+from types import MappingProxyType
 from pydantic import BaseModel, Field
-from enum import Enum
-from typing import Optional, Union, Any
+from typing import Annotated, Literal, Optional, Union, Any
 
 
-class LogLevel(str, Enum):
-    """Log severity levels."""
-    INFO = "INFO"
-    WARN = "WARN"
-    ERROR = "ERROR"
-    CRITICAL = "CRITICAL"
+# Log severity levels. A Literal validates as a plain string membership check
+# instead of constructing an Enum member for every log entry.
+LogLevel = Literal["INFO", "WARN", "ERROR", "CRITICAL"]
 
 
 class LogEntry(BaseModel):
@@ -123,6 +122,24 @@ class AnalyzeRequest(BaseModel):
     logs: list[LogEntry] = Field(..., min_length=1, description="Recent logs to analyze")
 
 
+# =============================================================================
+# Fast-path Request Structs (msgspec)
+# =============================================================================
+
+class LogEntryMsg(msgspec.Struct, frozen=True):
+    """msgspec mirror of LogEntry, decoded straight from the request body."""
+    id: str
+    timestamp: str
+    level: LogLevel
+    pod: str
+    message: str
+
+
+class AnalyzeRequestMsg(msgspec.Struct):
+    """msgspec mirror of AnalyzeRequest used by the analysis endpoints."""
+    logs: Annotated[list[LogEntryMsg], msgspec.Meta(min_length=1)]
+
+
 class AnalyzeResponse(BaseModel):
     """Response from log analysis endpoint."""
     success: bool
@@ -136,14 +153,16 @@ class ExecuteActionRequest(BaseModel):
     parameters: dict
 
 
-class ExecuteActionResponse(BaseModel):
+@dataclass(slots=True)
+class ExecuteActionResponse:
     """Response from action execution."""
     status: str
     message: str
     details: Optional[dict] = None
 
 
-class HealthResponse(BaseModel):
+@dataclass(slots=True)
+class HealthResponse:
     """Health check response."""
     status: str
     ollama_connected: bool
@@ -154,7 +173,7 @@ class HealthResponse(BaseModel):
 # Tool Registry (for documentation)
 # =============================================================================
 
-AVAILABLE_TOOLS = {
+AVAILABLE_TOOLS = MappingProxyType({
     "scale_deployment": {
         "description": "Scale a deployment to a specified number of replicas",
         "params": ScaleDeploymentParams,
@@ -195,4 +214,6 @@ AVAILABLE_TOOLS = {
         "params": NetworkPolicyParams,
         "use_cases": ["Security incident", "DDoS mitigation", "Traffic isolation"]
     }
-}
+})
+
+AVAILABLE_TOOL_NAMES = frozenset(AVAILABLE_TOOLS)
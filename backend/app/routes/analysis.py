@@ -2,71 +2,203 @@
 API routes for log analysis and action execution.
 """
 
-import json
 import asyncio
-from datetime import datetime
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+import msgspec
+import orjson
+import time
+from typing import Any, Callable, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 
 from app.models.schemas import (
     AnalyzeRequest,
+    AnalyzeRequestMsg,
     AnalyzeResponse,
+    LogEntryMsg,
     ExecuteActionRequest,
     ExecuteActionResponse,
     HealthResponse,
     IncidentToolCall,
-    AVAILABLE_TOOLS
+    AVAILABLE_TOOLS,
+    AVAILABLE_TOOL_NAMES
 )
 from app.services.ollama_service import (
     analyze_logs_with_ollama,
     analyze_logs_streaming,
     check_ollama_connection
 )
-from app.config import get_settings
+from app.config import HEALTH_CACHE_TTL, OLLAMA_MODEL, SIMULATE_EXECUTE_DELAY
+from app.serialization import dumps_json
 
 
 router = APIRouter()
 
 
+def _resource_limits_message(get: Callable[..., Any]) -> str:
+    """Summarize the limits applied by update_resource_limits."""
+    limits = []
+    if get('cpu_limit'):
+        limits.append(f"CPU limit: {get('cpu_limit')}")
+    if get('memory_limit'):
+        limits.append(f"Memory limit: {get('memory_limit')}")
+    return f"Updated resource limits for '{get('deployment')}': {', '.join(limits) if limits else 'no changes'}"
+
+
+# Execution result message per tool, keyed by tool name. Each builder receives
+# the bound `parameters.get` so lookups skip the attribute resolution.
+_MESSAGE_BUILDERS: dict[str, Callable[[Callable[..., Any]], str]] = {
+    "scale_deployment": lambda get: (
+        f"Scaled deployment '{get('deployment')}' to {get('replicas')} replicas in namespace '{get('namespace', 'default')}'"
+    ),
+    "restart_pod": lambda get: (
+        f"Restarted pod '{get('pod')}' {'gracefully' if get('graceful', True) else 'forcefully'} in namespace '{get('namespace', 'default')}'"
+    ),
+    "rollback_deployment": lambda get: (
+        f"Rolled back deployment '{get('deployment')}' to revision {get('revision', 'previous')} in namespace '{get('namespace', 'default')}'"
+    ),
+    "drain_node": lambda get: (
+        f"Drained node '{get('node')}' - all pods evicted successfully"
+    ),
+    "cordon_node": lambda get: (
+        f"Node '{get('node')}' has been {'cordoned' if get('cordon', True) else 'uncordoned'}"
+    ),
+    "delete_pod": lambda get: (
+        f"Pod '{get('pod')}' {'force ' if get('force', False) else ''}deleted from namespace '{get('namespace', 'default')}'"
+    ),
+    "update_resource_limits": _resource_limits_message,
+    "apply_network_policy": lambda get: (
+        f"Applied network policy '{get('policy_name')}' ({get('action')}) to pods matching '{get('target_pod_selector')}'"
+    ),
+}
+
+
+def _analyze_request_schema() -> dict:
+    """AnalyzeRequest JSON schema with the LogEntry definition inlined for OpenAPI."""
+    schema = AnalyzeRequest.model_json_schema()
+    # "#/$defs/..." refs would resolve against the OpenAPI document root, so inline them
+    defs = schema.pop("$defs")
+    schema["properties"]["logs"]["items"] = defs["LogEntry"]
+    return schema
+
+
+# The analysis endpoints decode their body with msgspec instead of Pydantic,
+# so the request schema has to be advertised to OpenAPI by hand.
+_ANALYZE_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": _analyze_request_schema()}},
+    }
+}
+
+
+# Built once so every request reuses the same compiled decoder for the log list
+_ANALYZE_DECODER = msgspec.json.Decoder(AnalyzeRequestMsg)
+
+
+async def _read_body(request: Request) -> bytearray:
+    """Read the request body into a single growing buffer."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+    return body
+
+
+async def decode_analyze_request(request: Request) -> list[LogEntryMsg]:
+    """Decode and validate an analysis request body with msgspec."""
+    body = await _read_body(request)
+    # Report errors in the same 422 list shape as FastAPI's own body validation
+    try:
+        parsed = _ANALYZE_DECODER.decode(body)
+    except msgspec.ValidationError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=[{"type": "value_error", "loc": ["body"], "msg": str(e)}]
+        )
+    except msgspec.DecodeError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=[{"type": "json_invalid", "loc": ["body"], "msg": f"JSON decode error: {e}"}]
+        )
+    return parsed.logs
+
+
+def _json_response(content: Any) -> Response:
+    """Serialize an internally built response dataclass without re-validating it."""
+    return Response(content=dumps_json(content), media_type="application/json")
+
+
+# Last Ollama connectivity result as (monotonic timestamp, connected)
+_health_cache: Optional[tuple[float, bool]] = None
+_health_lock = asyncio.Lock()
+
+
+async def _cached_ollama_status() -> bool:
+    """Check Ollama connectivity, reusing the last result for health_cache_ttl seconds."""
+    global _health_cache
+    cached = _health_cache
+    if cached and time.monotonic() - cached[0] < HEALTH_CACHE_TTL:
+        return cached[1]
+
+    # Coalesce concurrent probes into a single upstream check
+    async with _health_lock:
+        cached = _health_cache
+        if cached and time.monotonic() - cached[0] < HEALTH_CACHE_TTL:
+            return cached[1]
+        ollama_ok = await check_ollama_connection()
+        _health_cache = (time.monotonic(), ollama_ok)
+        return ollama_ok
+
+
 @router.get("/health", response_model=HealthResponse, tags=["Health"])
 async def health_check():
     """Check API and Ollama connection health."""
-    settings = get_settings()
-    ollama_ok = await check_ollama_connection()
+    ollama_ok = await _cached_ollama_status()
 
-    return HealthResponse(
+    return _json_response(HealthResponse(
         status="healthy" if ollama_ok else "degraded",
         ollama_connected=ollama_ok,
-        model=settings.ollama_model
-    )
+        model=OLLAMA_MODEL
+    ))
 
 
-@router.get("/tools", tags=["Tools"])
-async def list_tools():
-    """List all available remediation tools."""
-    tools = []
-    for name, info in AVAILABLE_TOOLS.items():
-        tools.append({
+# Tool schemas never change at runtime, so /tools is serialized once at import.
+_TOOLS_PAYLOAD = orjson.dumps({
+    "tools": [
+        {
             "name": name,
             "description": info["description"],
             "use_cases": info["use_cases"],
             "parameters": info["params"].model_json_schema()
-        })
-    return {"tools": tools}
+        }
+        for name, info in AVAILABLE_TOOLS.items()
+    ]
+})
 
 
-@router.post("/analyze", response_model=AnalyzeResponse, tags=["Analysis"])
-async def analyze_logs(request: AnalyzeRequest):
+@router.get("/tools", tags=["Tools"])
+async def list_tools():
+    """List all available remediation tools."""
+    return Response(content=_TOOLS_PAYLOAD, media_type="application/json")
+
+
+@router.post(
+    "/analyze",
+    response_model=AnalyzeResponse,
+    tags=["Analysis"],
+    openapi_extra=_ANALYZE_OPENAPI
+)
+async def analyze_logs(logs: list[LogEntryMsg] = Depends(decode_analyze_request)):
     """
     Analyze logs and propose remediation action using Ollama LLM (non-streaming).
     """
     try:
-        proposal = await analyze_logs_with_ollama(request.logs)
+        proposal = await analyze_logs_with_ollama(logs)
 
+        # Both branches are built from already-validated data, so skip re-validation
         if proposal:
-            return AnalyzeResponse(success=True, proposal=proposal)
+            return AnalyzeResponse.model_construct(success=True, proposal=proposal)
         else:
-            return AnalyzeResponse(
+            return AnalyzeResponse.model_construct(
                 success=False,
                 error="LLM analysis returned no proposal"
             )
@@ -75,22 +207,14 @@ async def analyze_logs(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/analyze/stream", tags=["Analysis"])
-async def analyze_logs_stream(request: AnalyzeRequest):
+@router.post("/analyze/stream", tags=["Analysis"], openapi_extra=_ANALYZE_OPENAPI)
+async def analyze_logs_stream(logs: list[LogEntryMsg] = Depends(decode_analyze_request)):
     """
     Analyze logs with streaming response (Server-Sent Events).
     """
-    async def event_generator():
-        try:
-            async for chunk in analyze_logs_streaming(request.logs):
-                event_type = chunk.get("type", "content")
-                data = json.dumps(chunk)
-                yield f"event: {event_type}\ndata: {data}\n\n"
-        except Exception as e:
-            yield f"event: error\ndata: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
-
+    # The service yields ready-encoded SSE frames and reports its own errors as events
     return StreamingResponse(
-        event_generator(),
+        analyze_logs_streaming(logs),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -100,6 +224,12 @@ async def analyze_logs_stream(request: AnalyzeRequest):
     )
 
 
+def _iso_now() -> str:
+    """Current local time formatted like datetime.now().isoformat(), without the datetime object."""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(seconds))}.{nanos // 1000:06d}"
+
+
 @router.post("/execute", response_model=ExecuteActionResponse, tags=["Actions"])
 async def execute_action(request: ExecuteActionRequest):
     """
@@ -108,55 +238,26 @@ async def execute_action(request: ExecuteActionRequest):
     tool_name = request.tool_name
     params = request.parameters
 
-    if tool_name not in AVAILABLE_TOOLS:
+    if tool_name not in AVAILABLE_TOOL_NAMES:
         raise HTTPException(status_code=400, detail=f"Unknown tool: {tool_name}")
 
-    # Simulate execution delay
-    await asyncio.sleep(2.0)
+    # Optional simulated execution delay for demos
+    if SIMULATE_EXECUTE_DELAY:
+        await asyncio.sleep(SIMULATE_EXECUTE_DELAY)
 
     # Generate response based on tool type
-    if tool_name == "scale_deployment":
-        message = f"Scaled deployment '{params.get('deployment')}' to {params.get('replicas')} replicas in namespace '{params.get('namespace', 'default')}'"
-
-    elif tool_name == "restart_pod":
-        graceful = "gracefully" if params.get('graceful', True) else "forcefully"
-        message = f"Restarted pod '{params.get('pod')}' {graceful} in namespace '{params.get('namespace', 'default')}'"
-
-    elif tool_name == "rollback_deployment":
-        revision = params.get('revision', 'previous')
-        message = f"Rolled back deployment '{params.get('deployment')}' to revision {revision} in namespace '{params.get('namespace', 'default')}'"
-
-    elif tool_name == "drain_node":
-        message = f"Drained node '{params.get('node')}' - all pods evicted successfully"
-
-    elif tool_name == "cordon_node":
-        action = "cordoned" if params.get('cordon', True) else "uncordoned"
-        message = f"Node '{params.get('node')}' has been {action}"
-
-    elif tool_name == "delete_pod":
-        force = "force " if params.get('force', False) else ""
-        message = f"Pod '{params.get('pod')}' {force}deleted from namespace '{params.get('namespace', 'default')}'"
-
-    elif tool_name == "update_resource_limits":
-        limits = []
-        if params.get('cpu_limit'):
-            limits.append(f"CPU limit: {params['cpu_limit']}")
-        if params.get('memory_limit'):
-            limits.append(f"Memory limit: {params['memory_limit']}")
-        message = f"Updated resource limits for '{params.get('deployment')}': {', '.join(limits) if limits else 'no changes'}"
-
-    elif tool_name == "apply_network_policy":
-        message = f"Applied network policy '{params.get('policy_name')}' ({params.get('action')}) to pods matching '{params.get('target_pod_selector')}'"
-
+    builder = _MESSAGE_BUILDERS.get(tool_name)
+    if builder:
+        message = builder(params.get)
     else:
         message = f"Executed {tool_name} with parameters: {params}"
 
-    return ExecuteActionResponse(
+    return _json_response(ExecuteActionResponse(
         status="success",
         message=message,
         details={
             "tool": tool_name,
             "parameters": params,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _iso_now()
         }
-    )
+    ))
@@ -0,0 +1,18 @@
+"""
+JSON encoding shared by the API responses and the SSE stream.
+"""
+
+import json
+from dataclasses import asdict
+from typing import Any
+
+import orjson
+
+
+def dumps_json(content: Any) -> bytes:
+    """Encode content to JSON bytes with orjson, falling back to the stdlib encoder."""
+    try:
+        return orjson.dumps(content)
+    except orjson.JSONEncodeError:
+        # LLM-supplied tool args can hold values orjson rejects (e.g. integers beyond 64 bits)
+        return json.dumps(content, default=asdict).encode()
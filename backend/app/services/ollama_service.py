@@ -2,16 +2,58 @@
 Ollama LLM service for log analysis with streaming support.
 """
 
+import asyncio
+import hashlib
 import json
+import logging
 import httpx
+import msgspec
+import orjson
 import re
-from typing import Optional, AsyncGenerator
-
-from app.config import get_settings
-from app.models.schemas import LogEntry, IncidentToolCall
-
-
-SYSTEM_PROMPT = """You are a Kubernetes Site Reliability Engineer (SRE) AI assistant.
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, Final, Optional
+
+from app.config import (
+    ANALYSIS_CACHE_SIZE,
+    ANALYSIS_CACHE_TTL,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_HOST,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_MAX_PARALLEL,
+    OLLAMA_MODEL,
+    OLLAMA_NUM_CTX,
+    OLLAMA_NUM_PREDICT,
+    OLLAMA_TIMEOUT
+)
+from app.models.schemas import AVAILABLE_TOOLS, LogEntryMsg, IncidentToolCall
+from app.serialization import dumps_json
+
+
+logger = logging.getLogger(__name__)
+
+_TAGS_URL = f"{OLLAMA_HOST}/api/tags"
+_CHAT_URL = f"{OLLAMA_HOST}/api/chat"
+
+# Generation can legitimately take minutes, but an unreachable Ollama should fail
+# fast instead of holding the caller for the whole read budget.
+_CHAT_TIMEOUT = httpx.Timeout(connect=OLLAMA_CONNECT_TIMEOUT, read=OLLAMA_TIMEOUT, write=10.0, pool=5.0)
+
+_DECODER = json.JSONDecoder()
+
+_THINK_BLOCK_RE = re.compile(r'<think>.*?</think>', re.DOTALL)
+_TOOLNAME_JSON_RE = re.compile(r'\{[^{}]*"toolName"[^}]*\}', re.DOTALL)
+
+# Shared client so every Ollama call reuses pooled keep-alive connections
+_client: Optional[httpx.AsyncClient] = None
+_client_lock = asyncio.Lock()
+
+# Ollama batches concurrent requests across its OLLAMA_NUM_PARALLEL slots. Keep at
+# most that many chats in flight so extra incidents wait here, outside the
+# request timeout, instead of queueing on the server.
+_ollama_slots = asyncio.Semaphore(OLLAMA_MAX_PARALLEL)
+
+SYSTEM_PROMPT: Final[str] = """You are a Kubernetes Site Reliability Engineer (SRE) AI assistant.
 Your job is to analyze Kubernetes logs and propose the most appropriate remediation action.
 
 ## Available Tools
@@ -65,21 +107,122 @@ Respond with a JSON object:
 - namespace defaults to "prod" unless logs indicate otherwise"""
 
 
-def format_logs_for_analysis(logs: list[LogEntry]) -> str:
-    """Format log entries for LLM analysis."""
-    formatted = []
+# Everything ahead of the log lines is identical across requests, so Ollama can
+# reuse the cached prompt prefix and only prefill the logs themselves.
+USER_PROMPT_PREFIX: Final[str] = """Analyze the Kubernetes log entries below. A critical incident has been detected.
+
+Based on these logs:
+1. Identify the root cause of the incident
+2. Choose the most appropriate remediation tool
+3. Provide the complete JSON response with toolName, args, and detailed reason
+
+Repeated entries are collapsed as [xN, first=<timestamp>, last=<timestamp>].
+
+LOGS:
+"""
+
+
+# JSON schema passed as the chat "format" so Ollama constrains decoding to a valid tool call
+TOOL_CALL_FORMAT = {
+    "type": "object",
+    "properties": {
+        "toolName": {"type": "string", "enum": list(AVAILABLE_TOOLS)},
+        "args": {"type": "object"},
+        "reason": {"type": "string"}
+    },
+    "required": ["toolName", "args", "reason"]
+}
+
+
+def format_logs_for_analysis(logs: list[LogEntryMsg]) -> str:
+    """
+    Format log entries for LLM analysis.
+
+    Repeated (level, pod, message) entries are collapsed into a single line with
+    a count and their first/last timestamps, in order of first appearance.
+    """
+    # (level, pod, message) -> [count, first timestamp, last timestamp]
+    groups: dict[tuple[str, str, str], list] = {}
     for log in logs:
-        formatted.append(f"[{log.timestamp}] [{log.level}] [{log.pod}] {log.message}")
-    return "\n".join(formatted)
+        group = groups.get((log.level, log.pod, log.message))
+        if group is None:
+            groups[(log.level, log.pod, log.message)] = [1, log.timestamp, log.timestamp]
+        else:
+            group[0] += 1
+            group[2] = log.timestamp
+
+    return "\n".join(
+        f"[{first}] [{level}] [{pod}] {message}" if count == 1
+        else f"[x{count}, first={first}, last={last}] [{level}] [{pod}] {message}"
+        for (level, pod, message), (count, first, last) in groups.items()
+    )
+
+
+def _payload_suffix(stream: bool) -> bytes:
+    """Serialize everything in the chat body after the messages array."""
+    return b"]," + orjson.dumps({
+        "stream": stream,
+        "format": TOOL_CALL_FORMAT,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.3,
+            "num_predict": OLLAMA_NUM_PREDICT,
+            "num_ctx": OLLAMA_NUM_CTX
+        }
+    })[1:]
+
+
+# Only the user message varies between chat requests, so the rest of the body is
+# serialized once: the prefix stops right after the system message and the
+# suffix closes the messages array and carries the options.
+_PAYLOAD_PREFIX: Final[bytes] = orjson.dumps({
+    "model": OLLAMA_MODEL,
+    "messages": [{"role": "system", "content": SYSTEM_PROMPT}]
+})[:-2] + b","
+_PAYLOAD_SUFFIXES: Final[dict[bool, bytes]] = {True: _payload_suffix(True), False: _payload_suffix(False)}
+_JSON_HEADERS: Final[dict[str, str]] = {"Content-Type": "application/json"}
+# Compression makes the client decompress in blocks, which delays tokens; the
+# one-shot call keeps httpx's default gzip/deflate negotiation.
+_STREAM_HEADERS: Final[dict[str, str]] = {**_JSON_HEADERS, "Accept-Encoding": "identity"}
+
+
+def _build_chat_payload(logs: list[LogEntryMsg], stream: bool) -> bytes:
+    """Build the serialized /api/chat request body for a log analysis."""
+    user_message = {"role": "user", "content": USER_PROMPT_PREFIX + format_logs_for_analysis(logs)}
+    return _PAYLOAD_PREFIX + orjson.dumps(user_message) + _PAYLOAD_SUFFIXES[stream]
+
+
+async def get_client() -> httpx.AsyncClient:
+    """Get the shared Ollama HTTP client, creating it on first use."""
+    global _client
+    if _client is None:
+        async with _client_lock:
+            if _client is None:
+                _client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=16,
+                        max_connections=32,
+                        keepalive_expiry=60.0
+                    ),
+                    http2=False  # Ollama only speaks HTTP/1.1
+                )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared Ollama HTTP client."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
 async def check_ollama_connection() -> bool:
     """Check if Ollama is reachable."""
-    settings = get_settings()
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{settings.ollama_host}/api/tags")
-            return response.status_code == 200
+        client = await get_client()
+        response = await client.get(_TAGS_URL, timeout=5.0)
+        return response.status_code == 200
     except Exception:
         return False
 
@@ -87,7 +230,7 @@ async def check_ollama_connection() -> bool:
 def extract_json_from_response(content: str) -> Optional[dict]:
     """Extract JSON from response, handling think tags and markdown."""
     # Remove <think>...</think> tags
-    content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
+    content = _THINK_BLOCK_RE.sub('', content)
     content = content.strip()
 
     # Handle markdown code blocks
@@ -99,175 +242,230 @@ def extract_json_from_response(content: str) -> Optional[dict]:
             content = parts[1].strip()
 
     # Try to find JSON object with toolName
-    json_match = re.search(r'\{[^{}]*"toolName"[^}]*\}', content, re.DOTALL)
+    json_match = _TOOLNAME_JSON_RE.search(content)
     if json_match:
         try:
-            return json.loads(json_match.group())
-        except:
+            return orjson.loads(json_match.group())
+        except orjson.JSONDecodeError:
             pass
 
-    # Try to find nested JSON
+    # Try to find nested JSON - decode the first complete object at any '{'
+    start = content.find('{')
+    while start != -1:
+        try:
+            return _DECODER.raw_decode(content, start)[0]
+        except json.JSONDecodeError:
+            start = content.find('{', start + 1)
+
     try:
-        # Find outermost braces
-        start = content.find('{')
-        if start != -1:
-            depth = 0
-            for i, c in enumerate(content[start:]):
-                if c == '{':
-                    depth += 1
-                elif c == '}':
-                    depth -= 1
-                    if depth == 0:
-                        json_str = content[start:start+i+1]
-                        return json.loads(json_str)
-    except:
-        pass
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return None
 
+
+def parse_tool_call(content: str) -> Optional[dict]:
+    """Parse a schema-constrained tool call, falling back to lenient extraction."""
     try:
-        return json.loads(content)
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # Servers without structured-output support may still wrap the JSON
+        return extract_json_from_response(content)
+    return data if isinstance(data, dict) else None
+
+
+# "event: <type>\ndata: " prefix for every event the stream emits
+_SSE_PREFIXES: Final[dict[str, bytes]] = {
+    event_type: b"event: " + event_type.encode() + b"\ndata: "
+    for event_type in ("thinking", "content", "done", "error")
+}
+_SSE_END = b"\n\n"
+
+
+def sse_frame(event_type: str, payload: dict) -> bytes:
+    """Encode a single Server-Sent Events frame."""
+    return _SSE_PREFIXES[event_type] + dumps_json(payload) + _SSE_END
+
+
+def _last_think_tag(token: str) -> int:
+    """Classify the last think tag in a token: 1 for <think>, -1 for </think>, 0 for none."""
+    end = token.rfind("think>")
+    while end > 0:
+        if token[end - 1] == "<":
+            return 1
+        if end >= 2 and token[end - 2:end] == "</":
+            return -1
+        end = token.rfind("think>", 0, end)
+    return 0
+
+
+def _decode_tool_call(answer: str) -> Optional[dict]:
+    """Decode the first complete tool-call object in the answer streamed so far."""
+    start = answer.find('{')
+    if start == -1:
+        return None
+    try:
+        data = _DECODER.raw_decode(answer, start)[0]
     except json.JSONDecodeError:
         return None
+    return data if "toolName" in data else None
+
+
+async def _aiter_ndjson(response: httpx.Response) -> AsyncGenerator[bytes, None]:
+    """Yield the non-empty lines of an NDJSON response body as raw bytes."""
+    pending = b""
+    async for data in response.aiter_bytes():
+        *lines, pending = (pending + data).split(b"\n")
+        for line in lines:
+            if line:
+                yield line
+    if pending:
+        yield pending
 
 
-async def analyze_logs_streaming(logs: list[LogEntry]) -> AsyncGenerator[dict, None]:
+async def analyze_logs_streaming(logs: list[LogEntryMsg]) -> AsyncGenerator[bytes, None]:
     """
     Analyze logs using Ollama with streaming.
-    Yields chunks with type: 'thinking', 'content', 'done', or 'error'
+    Yields encoded SSE frames with event type: 'thinking', 'content', 'done', or 'error'
     """
-    settings = get_settings()
-    log_context = format_logs_for_analysis(logs)
-
-    user_prompt = f"""Analyze these Kubernetes log entries. A critical incident has been detected.
-
-LOGS:
-{log_context}
-
-Based on these logs:
-1. Identify the root cause of the incident
-2. Choose the most appropriate remediation tool
-3. Provide the complete JSON response with toolName, args, and detailed reason"""
-
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(settings.ollama_timeout)) as client:
-            async with client.stream(
-                "POST",
-                f"{settings.ollama_host}/api/chat",
-                json={
-                    "model": settings.ollama_model,
-                    "messages": [
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "stream": True,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": 2000
-                    }
-                }
-            ) as response:
-                if response.status_code != 200:
-                    yield {"type": "error", "content": f"Ollama error: {response.status_code}"}
-                    return
-
-                full_content = ""
-                in_think = False
-
-                async for line in response.aiter_lines():
-                    if not line:
-                        continue
-
-                    try:
-                        chunk = json.loads(line)
-                        token = chunk.get("message", {}).get("content", "")
-                        full_content += token
-
-                        # Track thinking state
-                        if "<think>" in token:
-                            in_think = True
-                        if "</think>" in token:
+        client = await get_client()
+        async with _ollama_slots, client.stream(
+            "POST",
+            _CHAT_URL,
+            content=_build_chat_payload(logs, stream=True),
+            headers=_STREAM_HEADERS,
+            timeout=_CHAT_TIMEOUT
+        ) as response:
+            if response.status_code != 200:
+                yield sse_frame("error", {"type": "error", "content": f"Ollama error: {response.status_code}"})
+                return
+
+            content_parts: list[str] = []
+            answer_parts: list[str] = []
+            in_think = False
+
+            async for line in _aiter_ndjson(response):
+                try:
+                    chunk = orjson.loads(line)
+                    token = chunk.get("message", {}).get("content", "")
+                    content_parts.append(token)
+
+                    # Track thinking state from whichever tag comes last in the token.
+                    # Most streamed tokens are shorter than "<think>" and skip the scan.
+                    if len(token) >= 7:
+                        tag = _last_think_tag(token)
+                        if tag < 0:
                             in_think = False
                             continue
+                        if tag > 0:
+                            in_think = True
 
-                        if in_think or token.startswith("<think"):
-                            yield {"type": "thinking", "content": token}
-                        else:
-                            clean_token = re.sub(r'</?think>', '', token)
-                            if clean_token:
-                                yield {"type": "content", "content": clean_token}
-
-                        if chunk.get("done"):
-                            proposal = extract_json_from_response(full_content)
+                    # Tokens holding a full tag never reach the content branch,
+                    # so content tokens need no tag stripping
+                    if in_think or token.startswith("<think"):
+                        yield sse_frame("thinking", {"type": "thinking", "content": token})
+                    elif token:
+                        answer_parts.append(token)
+                        yield sse_frame("content", {"type": "content", "content": token})
+
+                        # A closing brace may complete the tool call; finish without
+                        # waiting for the rest of the stream or re-parsing it on done
+                        if "}" in token:
+                            proposal = _decode_tool_call("".join(answer_parts))
                             if proposal:
-                                yield {
-                                    "type": "done",
-                                    "proposal": proposal
-                                }
-                            else:
-                                print(f"[DEBUG] Failed to parse JSON from LLM response. Full content:\n{full_content}\n")
-                                yield {"type": "error", "content": f"Could not parse response as JSON. Response preview: {full_content[:500]}"}
-                    except json.JSONDecodeError:
-                        continue
+                                yield sse_frame("done", {"type": "done", "proposal": proposal})
+                                return
+
+                    if chunk.get("done"):
+                        full_content = "".join(content_parts)
+                        proposal = parse_tool_call(full_content)
+                        if proposal:
+                            yield sse_frame("done", {"type": "done", "proposal": proposal})
+                        else:
+                            logger.debug("Failed to parse JSON from LLM response. Full content:\n%s", full_content)
+                            yield sse_frame("error", {"type": "error", "content": f"Could not parse response as JSON. Response preview: {full_content[:500]}"})
+                except orjson.JSONDecodeError:
+                    continue
 
     except httpx.TimeoutException:
-        yield {"type": "error", "content": "Request timed out"}
+        yield sse_frame("error", {"type": "error", "content": "Request timed out"})
     except Exception as e:
-        yield {"type": "error", "content": str(e)}
+        yield sse_frame("error", {"type": "error", "content": str(e)})
 
 
-async def analyze_logs_with_ollama(logs: list[LogEntry]) -> Optional[IncidentToolCall]:
-    """
-    Analyze logs using Ollama LLM (non-streaming).
-    """
-    settings = get_settings()
-    log_context = format_logs_for_analysis(logs)
+# Recent non-streaming analyses, LRU ordered: log window hash -> (created_at, task)
+_analysis_cache: OrderedDict[bytes, tuple[float, asyncio.Future]] = OrderedDict()
 
-    user_prompt = f"""Analyze these Kubernetes log entries. A critical incident has been detected.
 
-LOGS:
-{log_context}
+def _logs_cache_key(logs: list[LogEntryMsg]) -> bytes:
+    """Hash the canonical JSON encoding of a log window."""
+    return hashlib.blake2b(msgspec.json.encode(logs), digest_size=16).digest()
 
-Based on these logs:
-1. Identify the root cause of the incident
-2. Choose the most appropriate remediation tool
-3. Provide the complete JSON response with toolName, args, and detailed reason"""
 
+async def analyze_logs_with_ollama(logs: list[LogEntryMsg]) -> Optional[IncidentToolCall]:
+    """
+    Analyze logs using Ollama LLM (non-streaming).
+
+    Identical log windows reuse the result for analysis_cache_ttl seconds, and
+    concurrent identical requests share a single in-flight Ollama call.
+    """
+    if ANALYSIS_CACHE_TTL <= 0:
+        return await _analyze_logs_uncached(logs)
+
+    key = _logs_cache_key(logs)
+    now = time.monotonic()
+    cached = _analysis_cache.get(key)
+    if cached is not None and now - cached[0] < ANALYSIS_CACHE_TTL:
+        _analysis_cache.move_to_end(key)
+        task = cached[1]
+    else:
+        task = asyncio.ensure_future(_analyze_logs_uncached(logs))
+        _analysis_cache[key] = (now, task)
+        if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+
+    # Shield so a disconnecting client doesn't cancel the call for other waiters
+    proposal = await asyncio.shield(task)
+    if proposal is None:
+        # Don't cache failures; the next request should retry Ollama
+        cached = _analysis_cache.get(key)
+        if cached is not None and cached[1] is task:
+            del _analysis_cache[key]
+    return proposal
+
+
+async def _analyze_logs_uncached(logs: list[LogEntryMsg]) -> Optional[IncidentToolCall]:
+    """Run a single non-streaming Ollama analysis."""
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(settings.ollama_timeout)) as client:
+        client = await get_client()
+        async with _ollama_slots:
             response = await client.post(
-                f"{settings.ollama_host}/api/chat",
-                json={
-                    "model": settings.ollama_model,
-                    "messages": [
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "num_predict": 2000
-                    }
-                }
+                _CHAT_URL,
+                content=_build_chat_payload(logs, stream=False),
+                headers=_JSON_HEADERS,
+                timeout=_CHAT_TIMEOUT
             )
 
-            if response.status_code != 200:
-                print(f"Ollama API error: {response.status_code} - {response.text}")
-                return None
+        if response.status_code != 200:
+            logger.error("Ollama API error: %s - %s", response.status_code, response.text)
+            return None
 
-            result = response.json()
-            content = result.get("message", {}).get("content", "").strip()
+        result = orjson.loads(response.content)
+        content = result.get("message", {}).get("content", "").strip()
 
-            proposal_data = extract_json_from_response(content)
+        proposal_data = parse_tool_call(content)
 
-            if not proposal_data:
-                print(f"Could not extract JSON from: {content[:300]}")
-                return None
+        if not proposal_data:
+            logger.warning("Could not extract JSON from: %.300s", content)
+            return None
 
-            return IncidentToolCall(
-                toolName=proposal_data.get("toolName", "scale_deployment"),
-                args=proposal_data.get("args", {}),
-                reason=proposal_data.get("reason", "AI analysis complete")
-            )
+        # Validate the aliased dict in one call to the model's compiled validator
+        return IncidentToolCall.model_validate({
+            "toolName": proposal_data.get("toolName", "scale_deployment"),
+            "args": proposal_data.get("args", {}),
+            "reason": proposal_data.get("reason", "AI analysis complete")
+        })
 
     except Exception as e:
-        print(f"Ollama analysis failed: {e}")
+        logger.error("Ollama analysis failed: %s", e)
         return None